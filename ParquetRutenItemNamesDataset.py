@@ -0,0 +1,143 @@
+#%%
+import os
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+from torch.utils.data import Dataset, DataLoader
+from tqdm import tqdm
+import time
+from bisect import bisect_right
+from RutenItemNamesDataset import ChunkShuffleSampler, collate_to_arrow, unescape_html_array
+
+# Number of rows per record batch of the Arrow IPC file, batches never span two parquet files so the last one of each file may be shorter.
+RECORD_BATCH_SIZE = 65536
+
+#%%
+class ParquetRutenItemNamesDataset(Dataset):
+    def __init__(self,
+                 arrow_path,
+                 col_item_name='G_NAME',
+                 create_arrow=False,
+                 path_to_ruten_items_folder=None,
+                 top_n=None,
+                 verbose=False):
+        '''
+        Alternative to RutenItemNamesDataset that stores all item names in a single Arrow IPC file instead of a SQLite database.
+        The file is memory-mapped, so __getitem__ reads a zero-copy slice of a record batch without going through SQLite.
+        Please notice that if the file already exists, setting create_arrow to True WILL remove it and re-create a new one.
+        '''
+
+        self._arrow_path = arrow_path
+        self._col_item_name = col_item_name
+        self._path_to_ruten_items_folder = path_to_ruten_items_folder
+        self._top_n = top_n
+        self._verbose = verbose
+        self._reader = None  # Arrow file reader of the process in self._reader_pid, see _get_reader()
+        self._batches = None  # record batches of self._reader, zero-copy views of the memory-mapped file
+        self._reader_pid = None
+
+        if create_arrow or not os.path.exists(self._arrow_path):
+            # Remove the existing file if it exists
+            if os.path.exists(self._arrow_path):
+                os.remove(self._arrow_path)
+
+            # Convert the parquet files into a single Arrow IPC file
+            self._create_arrow()
+
+        self._print(f'Loading record batch offsets...')
+        start = time.time()
+
+        # first row index of each record batch, used to map an index to (record batch, offset)
+        self._batch_starts = []
+        self._num_rows = 0
+        for batch in self._get_batches():
+            self._batch_starts.append(self._num_rows)
+            self._num_rows += batch.num_rows
+        self._print(f'Number of rows in {self._arrow_path}: {self._num_rows} (took {time.time() - start:.6f} seconds)')
+
+    def __getstate__(self):
+        # memory-mapped files can't be pickled (e.g. by DataLoader workers started with spawn), each process maps the file itself.
+        state = self.__dict__.copy()
+        state['_reader'] = None
+        state['_batches'] = None
+        state['_reader_pid'] = None
+        return state
+
+    def __len__(self):
+        return self._num_rows
+
+    def nunique(self):
+        return pc.count_distinct(self._get_reader().read_all().column(0)).as_py()
+
+    def __getitem__(self, index) -> str:
+        if not 0 <= index < self._num_rows:
+            raise IndexError(f'Index {index} is out of range.')
+        batch_idx = bisect_right(self._batch_starts, index) - 1
+        batch = self._get_batches()[batch_idx]
+        return batch.column(0)[index - self._batch_starts[batch_idx]].as_py()
+
+    def _get_reader(self):
+        '''
+        Return the Arrow file reader of the current process, memory-mapping the file on first use.
+        '''
+        if self._reader is None or self._reader_pid != os.getpid():
+            self._reader = pa.ipc.open_file(pa.memory_map(self._arrow_path, 'r'))
+            self._batches = None
+            self._reader_pid = os.getpid()
+        return self._reader
+
+    def _get_batches(self):
+        '''
+        Return the record batches of the current process's reader, read once so __getitem__ doesn't parse the batch metadata again on every call.
+        '''
+        reader = self._get_reader()
+        if self._batches is None:
+            self._batches = [reader.get_batch(i) for i in range(reader.num_record_batches)]
+        return self._batches
+
+    def _print(self, msg):
+        if self._verbose:
+            print(f'[ParquetRutenItemNamesDataset] {msg}')
+
+    def _create_arrow(self):
+        self._print('Creating Arrow file... (this may take a while)')
+
+        # Get a sorted list of all parquet files in the folder, so the row ids don't depend on the directory listing order
+        with os.scandir(self._path_to_ruten_items_folder) as entries:
+            parquet_files = sorted(entry.path for entry in entries if entry.is_file() and entry.name.endswith('.parquet'))
+        parquet_files = parquet_files[:self._top_n]
+
+        # Uncompressed, so record batches can be sliced straight out of the memory-mapped file
+        schema = pa.schema([(self._col_item_name, pa.string())])
+        with pa.OSFile(self._arrow_path, 'wb') as sink, pa.ipc.new_file(sink, schema) as writer:
+            for file in tqdm(parquet_files, desc="Processing parquet files", disable=not self._verbose):
+                parquet_file = pq.ParquetFile(file)
+                for batch in parquet_file.iter_batches(batch_size=RECORD_BATCH_SIZE, columns=[self._col_item_name]):
+                    item_names = unescape_html_array(batch.column(0)).cast(pa.string())
+                    writer.write_batch(pa.record_batch([item_names], schema=schema))
+
+        self._print("All parquet data has been written into the Arrow file.")
+
+#%%
+# Test the dataset
+if __name__ == '__main__':
+    print('initializing dataset...')
+    dataset = ParquetRutenItemNamesDataset(arrow_path='ruten.arrow',
+                                           col_item_name='G_NAME',
+                                           create_arrow=False,    # set to True to re-create the Arrow file
+                                           path_to_ruten_items_folder='F:/Datasets/Ruten/item/activate_item/',
+                                           top_n=None, # set to None to load all parquet files in the folder
+                                           verbose=True)
+
+    print('initializing dataloader...')
+    dataloader = DataLoader(dataset, batch_size=128, sampler=ChunkShuffleSampler(dataset, chunk_size=RECORD_BATCH_SIZE), collate_fn=collate_to_arrow)
+
+    for batch in dataloader:
+        input('Press Enter to continue...')
+        start = time.time()
+        for item in batch:
+            print(item)
+        print(f'Took {time.time() - start:.6} seconds to print 10 items.')
+
+
+#%%
@@ -1,14 +1,108 @@
 #%%
 import sqlite3
 import os
-from torch.utils.data import Dataset, DataLoader
-import pandas as pd
+import torch
+from torch.utils.data import Dataset, DataLoader, Sampler
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
 from tqdm import tqdm
 import html
-from multiprocessing import Pool
+from multiprocessing import Process, Queue
 import time
+import json
+from collections import OrderedDict
+from pathlib import Path
+
+# SQLite settings of the read-write connection, which is only used for the bulk load of a new database, see https://www.sqlite.org/pragma.html
+# No journaling and no fsync, the database is re-created from scratch on failure anyway. journal_mode=MEMORY isn't persisted in the file,
+# which stays in the default rollback journal mode and never gets a -wal file, so the immutable readers see every row in the main file.
+PAGE_SIZE = 4096
+LOAD_PRAGMAS = '''
+PRAGMA synchronous=OFF;
+PRAGMA journal_mode=MEMORY;
+PRAGMA temp_store=MEMORY;
+PRAGMA cache_size=-65536;
+'''
+
+# Settings of the read-only connections. The database file is opened as immutable, so reads take no locks,
+# and the large mmap_size lets SQLite read pages straight from the mapped file.
+READER_PRAGMAS = '''
+PRAGMA temp_store=MEMORY;
+PRAGMA cache_size=-262144;
+PRAGMA mmap_size=8589934592;
+'''
+
+# Size of sqlite3's compiled statement cache per connection.
+CACHED_STATEMENTS = 256
+
+# Number of consecutive rows read by one prefetch query, and how many of those chunks are kept in memory.
+PREFETCH_CHUNK_SIZE = 4096
+PREFETCH_MAX_CHUNKS = 64
+
+# Maximum number of ids bound to a single 'WHERE id IN (...)' query, the default SQLITE_MAX_VARIABLE_NUMBER of SQLite < 3.32.
+MAX_SQL_VARIABLES = 999
+
+# Number of rows decoded from parquet and bound to a single executemany call.
+INSERT_BATCH_SIZE = 100_000
+
+# Number of decoded chunks each decoding process may have waiting for the writer, bounds the memory of the multi-process load.
+DECODE_QUEUE_SIZE = 2
+
+# html entities decoded with Arrow compute kernels, &amp; must come last so that e.g. '&amp;lt;' becomes '&lt;' like html.unescape does.
+# It must also be the only one decoding to '&', otherwise an entity produced by one replacement could be decoded again by the next.
+COMMON_HTML_ENTITIES = [
+    ('&lt;', '<'), ('&gt;', '>'),
+    ('&quot;', '"'), ('&#34;', '"'),
+    ('&apos;', "'"), ('&#39;', "'"), ('&#x27;', "'"),
+    ('&nbsp;', '\xa0'),
+    ('&amp;', '&'),
+]
+COMMON_HTML_ENTITIES_REGEX = '&(?:lt|gt|quot|#34|apos|#39|#x27|nbsp|amp);'
 
 #%%
+def unescape_html_array(item_names):
+    '''
+    Unescape html entities (e.g. &amp; -> &) in an Arrow string array, giving the same result as html.unescape on every element.
+    The common entities are replaced with Arrow compute kernels, only names containing any other '&' go through html.unescape.
+    '''
+    if isinstance(item_names, pa.ChunkedArray):
+        item_names = item_names.combine_chunks()
+    if not pc.any(pc.match_substring(item_names, '&')).as_py():
+        return item_names
+
+    unescaped = item_names
+    for entity, char in COMMON_HTML_ENTITIES:
+        unescaped = pc.replace_substring(unescaped, entity, char)
+
+    # other named entities, numeric references and entities without ';' fall back to html.unescape
+    others = pc.replace_substring_regex(item_names, COMMON_HTML_ENTITIES_REGEX, '')
+    needs_fallback = pc.fill_null(pc.match_substring(others, '&'), False)
+    if pc.any(needs_fallback).as_py():
+        fallback = [html.unescape(item_name) for item_name in item_names.filter(needs_fallback).to_pylist()]
+        unescaped = pc.replace_with_mask(unescaped, needs_fallback, pa.array(fallback, type=unescaped.type))
+    return unescaped
+
+def _iter_parquet_col(file_path, col_name):
+    '''
+    Read a single column of a parquet file in chunks of INSERT_BATCH_SIZE rows, yielding lists of unescaped item names.
+    '''
+    for batch in pq.ParquetFile(file_path).iter_batches(batch_size=INSERT_BATCH_SIZE, columns=[col_name]):
+        yield unescape_html_array(batch.column(0)).to_pylist()
+
+def _decode_parquet_files(file_paths, col_name, queue):
+    '''
+    Target of the decoding processes: put the chunks of unescaped item names of each file into the queue, followed by None at the end of each file.
+    An exception is put into the queue instead, so the writer doesn't wait forever. Defined at module level so it can be pickled by multiprocessing.
+    '''
+    try:
+        for file_path in file_paths:
+            for item_names in _iter_parquet_col(file_path, col_name):
+                queue.put(item_names)
+            queue.put(None)
+    except Exception as e:
+        queue.put(e)
+
 class RutenItemNamesDataset(Dataset):
     def __init__(self, 
                  db_path,
@@ -16,73 +110,202 @@ class RutenItemNamesDataset(Dataset):
                  col_item_name='G_NAME',
                  create_db=False, 
                  path_to_ruten_items_folder=None, 
-                 batch_size=1,  # for multi-processing, not working yet
-                 num_workers=1, # for multi-processing, not working yet
+                 num_workers=1, # number of processes decoding parquet files while creating the database
                  top_n=None, 
+                 prefetch_chunk_size=0,
+                 use_duckdb=False,  # load the parquet files with DuckDB instead of executemany, requires the duckdb package
                  verbose=False):
         '''
         Please notice that if the database already exists, setting create_db to True WILL remove it and re-create a new one.
+        The database is opened read-only and immutable once created, it must not be modified by anything else while the dataset is in use.
+        By default every item is read with its own query, which suits random access (e.g. DataLoader with shuffle=True).
+        Setting prefetch_chunk_size (e.g. to PREFETCH_CHUNK_SIZE) reads chunks of that many consecutive rows with one sequential query instead,
+        this only pays off with a sampler visiting whole chunks such as ChunkShuffleSampler(dataset, chunk_size=prefetch_chunk_size).
+        With shuffle=True almost every index would read a whole chunk for a single item.
         '''
 
         self._db_path = db_path
         self._db_name = os.path.basename(self._db_path)
+        self._metadata_path = f'{self._db_path}.json'  # sidecar file, so opening the database never writes to it
         self._table_name = table_name
         self._col_item_name = col_item_name
         self._path_to_ruten_items_folder = path_to_ruten_items_folder
-        self._batch_size = batch_size
         self._num_workers = num_workers
         self._top_n = top_n
+        self._use_duckdb = use_duckdb
         self._verbose = verbose
+        self._prefetch_chunk_size = prefetch_chunk_size
+        self._prefetch = OrderedDict()  # chunk_id -> {id: item name}, least recently used first
+        self._select_sql = f"SELECT {self._col_item_name} FROM {self._table_name} WHERE id = ?"
+        self._select_range_sql = f"SELECT id, {self._col_item_name} FROM {self._table_name} WHERE id BETWEEN ? AND ?"
+        self._reader = None  # read-only connection of the process in self._reader_pid, see _get_reader()
+        self._reader_pid = None
 
         if create_db or not os.path.exists(self._db_path):
             # Remove the existing database if it exists
             if os.path.exists(self._db_path):   
                 os.remove(self._db_path)
+            if os.path.exists(self._metadata_path):
+                os.remove(self._metadata_path)
 
             # Create a new sqlite .db file
-            self._connection = sqlite3.connect(self._db_path) 
+            self._connection = sqlite3.connect(self._db_path, cached_statements=CACHED_STATEMENTS) 
             self._cursor = self._connection.cursor()
 
+            # page_size only takes effect before the first table is created
+            self._cursor.execute(f'PRAGMA page_size={PAGE_SIZE};')
+            self._apply_pragmas()
+
             # Create the table and insert data into it
             self._create_db()
-        else:
-            # Connect to the SQLite database
-            self._connection = sqlite3.connect(self._db_path)
-            self._cursor = self._connection.cursor()
+
+            # the read-write connection is only needed to create the database, reads go through _get_reader().
+            self._connection.close()
+            self._connection = None
+            self._cursor = None
 
         self._print(f'Loading database metadata...')
         start = time.time()
 
-        # create a table for metadata if not exists
-        self._cursor.execute(f"CREATE TABLE IF NOT EXISTS metadata (key TEXT PRIMARY KEY, value TEXT);")
-        self._connection.commit()
-        
-        # try to get the number of rows from the metadata table, if failed, calculate it and store it in the metadata table.
-        try:
-            self._num_rows = int(self._cursor.execute(f"SELECT value FROM metadata WHERE key = 'num_rows';").fetchone()[0])
-        except:
-            self._print(f'Calculating the number of rows in the table {self._table_name}...')
-            self._num_rows = self._cursor.execute(f'SELECT COUNT(*) FROM {self._table_name}').fetchone()[0]
-            self._cursor.execute(f"INSERT INTO metadata (key, value) VALUES ('num_rows', '{self._num_rows}');")
-            self._connection.commit()
+        metadata = self._load_metadata()
+        self._num_rows = metadata['num_rows']
         self._print(f'Number of rows in the table {self._table_name}: {self._num_rows} (took {time.time() - start:.6f} seconds)')
 
+        # databases created before item names were unescaped at load time still need to be unescaped on every read.
+        self._unescape_on_read = not metadata['html_unescaped']
+
+    def __getstate__(self):
+        # sqlite3 connections can't be pickled (e.g. by DataLoader workers started with spawn), each process opens its own.
+        state = self.__dict__.copy()
+        state['_reader'] = None
+        state['_reader_pid'] = None
+        state['_prefetch'] = OrderedDict()
+        return state
+
     def __len__(self):
         return self._num_rows
 
     def nunique(self):
-        return self._cursor.execute(f'SELECT COUNT(DISTINCT {self._col_item_name}) FROM {self._table_name}').fetchone()[0]
+        return self._get_reader().execute(f'SELECT COUNT(DISTINCT {self._col_item_name}) FROM {self._table_name}').fetchone()[0]
     
     def __getitem__(self, index) -> str:
-        index += 1  # SQLite starts from 1
-        select_query = f"SELECT * FROM {self._table_name} WHERE id = ?"
-        self._cursor.execute(select_query, (index,))
-        row = self._cursor.fetchone()[1]
-        if row is None:
-            raise IndexError(f'Index {index} is out of range.')
-        row = html.unescape(row) # unescape html entities, e.g. &amp; -> &.
+        if self._prefetch_chunk_size:
+            chunk = self._get_chunk(index // self._prefetch_chunk_size)
+            if index + 1 not in chunk:  # SQLite starts from 1
+                raise IndexError(f'Index {index} is out of range.')
+            row = chunk[index + 1]
+        else:
+            # the query text never changes, so sqlite3 reuses the compiled statement from its cache
+            row = self._get_reader().execute(self._select_sql, (index + 1,)).fetchone()  # SQLite starts from 1
+            if row is None:
+                raise IndexError(f'Index {index} is out of range.')
+            row = row[0]
+
+        return self._unescape(row)
+
+    def __getitems__(self, indices) -> list:
+        '''
+        Return the item names of a whole batch, DataLoader calls this once per batch instead of calling __getitem__ for every index.
+        '''
+        if self._prefetch_chunk_size:
+            return [self[index] for index in indices]
+
+        # without prefetching, look up the whole batch with as few queries as the SQLite variable limit allows
+        ids = [index + 1 for index in indices]  # SQLite starts from 1
+        rows = {}
+        for start in range(0, len(ids), MAX_SQL_VARIABLES):
+            batch_ids = ids[start:start + MAX_SQL_VARIABLES]
+            placeholders = ', '.join('?' * len(batch_ids))
+            select_query = f"SELECT id, {self._col_item_name} FROM {self._table_name} WHERE id IN ({placeholders})"
+            rows.update(self._get_reader().execute(select_query, batch_ids).fetchall())
+
+        items = []
+        for index, id in zip(indices, ids):
+            if id not in rows:
+                raise IndexError(f'Index {index} is out of range.')
+            items.append(self._unescape(rows[id]))
+        return items
+
+    def _unescape(self, row):
+        if self._unescape_on_read and '&' in row:  # most item names have no entities, skip the regex scan for them
+            row = html.unescape(row) # unescape html entities, e.g. &amp; -> &.
+        return row
+
+    def _get_chunk(self, chunk_id):
+        '''
+        Return the rows of a chunk as {id: item name}, reading the whole id range with one sequential query on a miss.
+        '''
+        chunk = self._prefetch.get(chunk_id)
+        if chunk is not None:
+            self._prefetch.move_to_end(chunk_id)
+            return chunk
+
+        first_id = chunk_id * self._prefetch_chunk_size + 1
+        last_id = first_id + self._prefetch_chunk_size - 1
+        chunk = dict(self._get_reader().execute(self._select_range_sql, (first_id, last_id)).fetchall())
+        self._prefetch[chunk_id] = chunk
+        if len(self._prefetch) > PREFETCH_MAX_CHUNKS:
+            self._prefetch.popitem(last=False)
+        return chunk
+
+    def _load_metadata(self):
+        '''
+        Load the metadata from the sidecar json file. If it doesn't exist yet (databases created by older versions), or was written
+        for a database file of a different size or modification time (e.g. the .db file was replaced), read it from the metadata table,
+        or calculate the number of rows, and try to save it to the sidecar file.
+        '''
+        try:
+            with open(self._metadata_path, 'r') as f:
+                metadata = json.load(f)
+            if metadata.get('db_file') == self._db_file_signature():
+                return metadata
+            self._print(f'{self._metadata_path} belongs to a different database file, reloading the metadata...')
+        except (OSError, json.JSONDecodeError):
+            pass
+
+        reader = self._get_reader()
+        metadata = {}
+        if reader.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'metadata';").fetchone() is not None:
+            metadata = dict(reader.execute("SELECT key, value FROM metadata;").fetchall())
+
+        if 'num_rows' in metadata:
+            num_rows = int(metadata['num_rows'])
+        else:
+            self._print(f'Calculating the number of rows in the table {self._table_name}...')
+            num_rows = reader.execute(f'SELECT COUNT(*) FROM {self._table_name}').fetchone()[0]
+
+        metadata = {'num_rows': num_rows, 'html_unescaped': 'html_unescaped' in metadata}
+        # the sidecar file is only a cache, the database may live on read-only storage
+        try:
+            self._save_metadata(metadata)
+        except OSError as e:
+            self._print(f'Could not save the metadata to {self._metadata_path}: {e}')
+        return metadata
 
-        return row  # return a tuple: (id, G_NAME)
+    def _save_metadata(self, metadata):
+        metadata = {**metadata, 'db_file': self._db_file_signature()}
+        with open(self._metadata_path, 'w') as f:
+            json.dump(metadata, f)
+
+    def _db_file_signature(self):
+        # size and modification time of the database file, ties the sidecar file to the database it was written for
+        stat = os.stat(self._db_path)
+        return [stat.st_size, stat.st_mtime_ns]
+
+    def _get_reader(self):
+        '''
+        Return the read-only connection of the current process, opening it on first use.
+        A connection inherited through fork (e.g. by DataLoader workers) is never reused, since sqlite3 connections must not cross processes.
+        '''
+        if self._reader is None or self._reader_pid != os.getpid():
+            uri = f'{Path(self._db_path).resolve().as_uri()}?mode=ro&immutable=1'
+            self._reader = sqlite3.connect(uri, uri=True, check_same_thread=False, cached_statements=CACHED_STATEMENTS)
+            self._reader.executescript(READER_PRAGMAS)
+            self._reader_pid = os.getpid()
+        return self._reader
+
+    def _apply_pragmas(self):
+        self._cursor.executescript(LOAD_PRAGMAS)
 
     def _print(self, msg):
         if self._verbose:
@@ -91,12 +314,8 @@ class RutenItemNamesDataset(Dataset):
     def _create_db(self):   # slow as fuck, took 30+ min to load 250M rows.
         self._print('Creating database... (this may take a while)')
 
-        # Function to read parquet files and insert data into the SQLite database
-        def process_parquet_file(file_path):
-            df = pd.read_parquet(file_path, columns=[self._col_item_name])
-            self._cursor.executemany(f"INSERT INTO {self._table_name} ({self._col_item_name}) VALUES (?)", 
-                               df[[self._col_item_name]].values)
-
+        # id is an alias of the rowid, so rows are appended to the table b-tree in order and no separate index is maintained.
+        # Secondary indexes, if ever needed, should be created after the bulk load.
         create_table_query = f"""
         CREATE TABLE {self._table_name} (
             id INTEGER PRIMARY KEY,
@@ -106,22 +325,144 @@ class RutenItemNamesDataset(Dataset):
         self._cursor.execute(create_table_query)
         self._connection.commit()
 
-        # Get a list of all parquet files in the current directory
-        parquet_files = []
-        for filename in os.listdir(self._path_to_ruten_items_folder):
-            if filename.endswith('.parquet'):
-                parquet_files.append(os.path.join(self._path_to_ruten_items_folder, filename))
+        # Get a sorted list of all parquet files in the folder, so the row ids don't depend on the directory listing order
+        with os.scandir(self._path_to_ruten_items_folder) as entries:
+            parquet_files = sorted(entry.path for entry in entries if entry.is_file() and entry.name.endswith('.parquet'))
         parquet_files = parquet_files[:self._top_n]
 
-        # Process each parquet file and insert data into the table
-        with tqdm(total=len(parquet_files), desc="Processing parquet files", disable=not self._verbose) as pbar:
-            for idx, file in enumerate(parquet_files):
-                process_parquet_file(file)
-                self._connection.commit()
-                pbar.update(1)
+        if self._use_duckdb:
+            num_rows = self._load_with_duckdb(parquet_files)
+        else:
+            num_rows = self._load_with_executemany(parquet_files)
+
+        # store the number of inserted rows so opening the database never needs a COUNT(*) scan
+        self._cursor.execute(f"CREATE TABLE IF NOT EXISTS metadata (key TEXT PRIMARY KEY, value TEXT);")
+        self._cursor.execute(f"INSERT OR REPLACE INTO metadata (key, value) VALUES ('num_rows', ?);", (str(num_rows),))
+        self._cursor.execute(f"INSERT OR REPLACE INTO metadata (key, value) VALUES ('html_unescaped', '1');")
+        self._connection.commit()
+
+        # Gather planner statistics once, sampling at most analysis_limit rows instead of scanning the whole table.
+        self._cursor.executescript('PRAGMA analysis_limit=1000; ANALYZE;')
+
+        self._save_metadata({'num_rows': num_rows, 'html_unescaped': True})
 
         self._print("All parquet data has been loaded into the SQLite database.")
 
+    def _load_with_executemany(self, parquet_files):
+        '''
+        Insert the item names of the parquet files through this connection, returns the number of inserted rows.
+        '''
+        num_rows = 0
+
+        # Function to insert a list of item names into the SQLite database
+        def insert_item_names(item_names):
+            nonlocal num_rows
+            num_rows += len(item_names)
+            self._cursor.executemany(f"INSERT INTO {self._table_name} ({self._col_item_name}) VALUES (?)", 
+                               ((item_name,) for item_name in item_names))
+
+        # Process each parquet file and insert data into the table, all in one transaction so it is fsync'ed only once.
+        self._connection.execute('BEGIN IMMEDIATE')
+        with tqdm(total=len(parquet_files), desc="Processing parquet files", disable=not self._verbose) as pbar:
+            if self._num_workers > 1:
+                # decode parquet files in worker processes, this process stays the only writer of the database.
+                # Files are dealt round-robin and each worker has its own bounded queue, so reading the queues in the same
+                # round-robin order keeps the ids in the same order as the single-process path, and a worker that gets
+                # ahead of the writer blocks instead of piling up decoded chunks in memory.
+                queues = [Queue(maxsize=DECODE_QUEUE_SIZE) for _ in range(self._num_workers)]
+                workers = [Process(target=_decode_parquet_files,
+                                   args=(parquet_files[i::self._num_workers], self._col_item_name, queues[i]),
+                                   daemon=True)
+                           for i in range(self._num_workers)]
+                for worker in workers:
+                    worker.start()
+                try:
+                    for idx, file in enumerate(parquet_files):
+                        for item_names in iter(queues[idx % self._num_workers].get, None):
+                            if isinstance(item_names, Exception):
+                                raise item_names
+                            insert_item_names(item_names)
+                        pbar.update(1)
+                    for worker in workers:
+                        worker.join()
+                finally:
+                    for worker in workers:
+                        if worker.is_alive():
+                            worker.terminate()
+            else:
+                for idx, file in enumerate(parquet_files):
+                    for item_names in _iter_parquet_col(file, self._col_item_name):
+                        insert_item_names(item_names)
+                    pbar.update(1)
+        self._connection.commit()
+
+        return num_rows
+
+    def _load_with_duckdb(self, parquet_files):
+        '''
+        Insert the item names of the parquet files with a single INSERT ... SELECT executed by DuckDB, which reads the parquet files
+        and writes into the attached SQLite database in vectorized batches. Returns the number of inserted rows.
+        DuckDB writes through its own SQLite connection, so LOAD_PRAGMAS (synchronous=OFF, journal_mode=MEMORY) don't apply to it,
+        it runs with SQLite's defaults but still fsyncs only once, as the whole INSERT is a single transaction.
+        Requires the duckdb and numpy packages (DuckDB needs numpy for the Arrow UDF unescaping the item names), and network access
+        the first time, when INSTALL sqlite downloads DuckDB's sqlite extension.
+        '''
+        # read_parquet fails on an empty list, the executemany loader creates an empty database in that case too
+        if not parquet_files:
+            return 0
+
+        import duckdb  # optional dependency, only needed for this loading path
+
+        def quote(value):
+            return "'" + value.replace("'", "''") + "'"
+
+        # DuckDB writes through its own SQLite connection, so this one must not hold a transaction.
+        self._connection.commit()
+
+        self._print(f'Loading {len(parquet_files)} parquet files with DuckDB...')
+        con = duckdb.connect()
+        try:
+            con.execute('INSTALL sqlite; LOAD sqlite;')
+            con.create_function('unescape_html', unescape_html_array, ['VARCHAR'], 'VARCHAR', type='arrow')
+            con.execute(f'ATTACH {quote(self._db_path)} AS ruten (TYPE sqlite);')
+            parquet_list = ', '.join(quote(file) for file in parquet_files)
+            num_rows = con.execute(f"""
+                INSERT INTO ruten.{self._table_name} ({self._col_item_name})
+                SELECT unescape_html({self._col_item_name}) FROM read_parquet([{parquet_list}]);
+            """).fetchone()[0]
+        finally:
+            con.close()
+
+        return num_rows
+
+#%%
+def collate_to_arrow(batch):
+    '''
+    DataLoader collate_fn building a single Arrow string array out of a batch of item names, instead of a list of python strings.
+    Its contiguous buffer can be handed to tokenizers accepting Arrow without converting each string.
+    '''
+    return pa.array(batch, type=pa.string())
+
+class ChunkShuffleSampler(Sampler):
+    '''
+    Shuffle a dataset at the granularity of chunks of consecutive indices, then shuffle the indices inside each chunk.
+    Every chunk is visited as a whole, so RutenItemNamesDataset reads it from SQLite with a single sequential query.
+    '''
+    def __init__(self, data_source, chunk_size=PREFETCH_CHUNK_SIZE, generator=None):
+        self._num_samples = len(data_source)
+        self._chunk_size = chunk_size
+        self._generator = generator
+
+    def __len__(self):
+        return self._num_samples
+
+    def __iter__(self):
+        num_chunks = (self._num_samples + self._chunk_size - 1) // self._chunk_size
+        for chunk_id in torch.randperm(num_chunks, generator=self._generator).tolist():
+            start = chunk_id * self._chunk_size
+            size = min(self._chunk_size, self._num_samples - start)
+            yield from (start + torch.randperm(size, generator=self._generator)).tolist()
+
 #%%
 # Test the dataset
 if __name__ == '__main__':
@@ -132,10 +473,11 @@ if __name__ == '__main__':
                                     create_db=False,    # set to True to re-create the database
                                     path_to_ruten_items_folder='F:/Datasets/Ruten/item/activate_item/',
                                     top_n=None, # set to None to load all parquet files in the folder
+                                    prefetch_chunk_size=PREFETCH_CHUNK_SIZE,    # set to 0 when using shuffle=True instead of ChunkShuffleSampler
                                     verbose=True)
     
     print('initializing dataloader...')
-    dataloader = DataLoader(dataset, batch_size=128, shuffle=True)
+    dataloader = DataLoader(dataset, batch_size=128, sampler=ChunkShuffleSampler(dataset, chunk_size=PREFETCH_CHUNK_SIZE), collate_fn=collate_to_arrow)
 
     for batch in dataloader:
         input('Press Enter to continue...')